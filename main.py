@@ -7,6 +7,7 @@ import datetime
 import pytz
 
 from engine import Croissantdealer
+from profiler import Profiler
 
 # define stuff
 # get the token from secrets.env
@@ -19,6 +20,11 @@ environment = os.getenv("environment")
 # the username that will be able to play with the bot if in dev environment
 dev_username = os.getenv("dev_username")
 verbose = os.getenv("verbose")
+# set it to "True" to profile the move calculation of every game (the dev_username can also toggle it with '?profile')
+profiling = os.getenv("profiling", "").lower() == "true"
+# where to save the .pstats files, and how many of them to keep
+profiling_dir = os.getenv("profiling_dir", "profiles")
+profiling_max_files = int(os.getenv("profiling_max_files", "100"))
 
 # set some constants
 headers = {'Authorization': f'Bearer {token}'}
@@ -69,7 +75,8 @@ class Lichess:
         self.url = url
         self.environment = environment
         self.verbose = verbose
-        self.command_list = ["?help", "?eval"]
+        self.command_list = ["?help", "?eval", "?profile"]
+        self.profiler = Profiler(output_dir=profiling_dir, max_files=profiling_max_files)
 
         # type them in lowercase!!
         self.accepted_variants = ["standard", "fromposition"]
@@ -144,6 +151,28 @@ class Lichess:
 
                     self.start_game(game_id=game_id, color=color, fen=fen)
 
+    def calculate_move(self, game_id: str, croissantdealer: Croissantdealer):
+        """calculate the move to make (profiling it, if it's enabled for the game)"""
+        if not self.profiler.is_enabled(game_id):
+            return croissantdealer.get_move()[0]
+
+        # e.g. "12-white", the side is needed to tell apart the white's and black's moves with the same number
+        move_name = f"{croissantdealer.board.fullmove_number}-{'white' if croissantdealer.board.turn else 'black'}"
+        result, timings, error = self.profiler.profile(f"{game_id}-{move_name}", croissantdealer.get_move)
+
+        if error:
+            logs.error(f"Failed to save the profile of move {move_name} in a game with an id of: '{game_id}'. "
+                       f"Here is the error: {error}")
+        elif timings is None:
+            logs.warning(f"Didn't profile move {move_name} in a game with an id of: '{game_id}', "
+                         f"because another move is being profiled right now")
+        else:
+            timings_string = ", ".join(f"{name}: {timing['calls']} calls, {timing['time']:.3f}s"
+                                       for name, timing in timings.items())
+            logs.info(f"Profiled move {move_name} in a game with an id of: '{game_id}'. {timings_string}")
+
+        return result[0]
+
     def play_move(self, game_id: str, move: str, croissantdealer: Croissantdealer):
         croissantdealer.make_move(move)
 
@@ -164,48 +193,56 @@ class Lichess:
         # connect to the game stream
         response = requests.get(f'{self.url}/api/bot/game/stream/{game_id}', headers=self.headers, stream=True)
 
-        for line in response.iter_lines():
-            # filter out keep-alive new lines
-            if line:
-                logs.info("Received a event! (game)")
+        if profiling:
+            self.profiler.enable(game_id)
 
-                decoded_line = line.decode('utf-8')
-                json_data = json.loads(decoded_line)
+        try:
+            for line in response.iter_lines():
+                # filter out keep-alive new lines
+                if line:
+                    logs.info("Received a event! (game)")
 
-                # process the events here
-                # check if we need to make a move
-                try:
-                    if json_data["status"] == "mate":
-                        if json_data["winner"].lower() == color:
-                            logs.info(f"game with an id of {game_id} has ended! We won :)")
-                            self.send_message(game_id=game_id, text="gg's! :)")
-                        else:
-                            logs.info(f"game with an id of {game_id} has ended! We lost :P")
-                            self.send_message(game_id=game_id, text="Well, I'm pretty sure that i was "
-                                                                    "close to winning :P. gg's! :)")
-
-                        return
-                except KeyError:
-                    pass
-
-                if croissantdealer.our_move():
-                    # calculate the move to make
-                    move = croissantdealer.get_move()[0]
-                    self.play_move(game_id=game_id, move=str(move), croissantdealer=croissantdealer)
-                else:
+                    decoded_line = line.decode('utf-8')
+                    json_data = json.loads(decoded_line)
+
+                    # process the events here
+                    # check if we need to make a move
                     try:
-                        if croissantdealer.get_uci() != json_data["moves"]:
-                            # make the move on croissantdealer's board
-                            croissantdealer.make_move(f'{json_data["moves"].split(" ")[-1]}')
-
-                            # calculate the move to make
-                            move = croissantdealer.get_move()[0]
-                            self.play_move(game_id=game_id, move=str(move), croissantdealer=croissantdealer)
-                    except KeyError as e:
-                        # check if the event is a chat message
-                        if json_data["type"] == "chatLine":
-                            if json_data["text"] in self.command_list:
-                                self.commands(game_id=game_id, text=json_data["text"], croissantdealer=croissantdealer)
+                        if json_data["status"] == "mate":
+                            if json_data["winner"].lower() == color:
+                                logs.info(f"game with an id of {game_id} has ended! We won :)")
+                                self.send_message(game_id=game_id, text="gg's! :)")
+                            else:
+                                logs.info(f"game with an id of {game_id} has ended! We lost :P")
+                                self.send_message(game_id=game_id, text="Well, I'm pretty sure that i was "
+                                                                        "close to winning :P. gg's! :)")
+
+                            return
+                    except KeyError:
+                        pass
+
+                    if croissantdealer.our_move():
+                        # calculate the move to make
+                        move = self.calculate_move(game_id=game_id, croissantdealer=croissantdealer)
+                        self.play_move(game_id=game_id, move=str(move), croissantdealer=croissantdealer)
+                    else:
+                        try:
+                            if croissantdealer.get_uci() != json_data["moves"]:
+                                # make the move on croissantdealer's board
+                                croissantdealer.make_move(f'{json_data["moves"].split(" ")[-1]}')
+
+                                # calculate the move to make
+                                move = self.calculate_move(game_id=game_id, croissantdealer=croissantdealer)
+                                self.play_move(game_id=game_id, move=str(move), croissantdealer=croissantdealer)
+                        except KeyError as e:
+                            # check if the event is a chat message
+                            if json_data["type"] == "chatLine":
+                                if json_data["text"] in self.command_list:
+                                    self.commands(game_id=game_id, text=json_data["text"],
+                                                  croissantdealer=croissantdealer, username=json_data["username"])
+        finally:
+            # stop profiling the game, however it has ended
+            self.profiler.disable(game_id)
 
     def start_game(self, game_id: str, color: str, fen: str):
         """starts playing a game"""
@@ -269,11 +306,12 @@ class Lichess:
 
             return 1
 
-    def commands(self, game_id: str, croissantdealer: Croissantdealer, text: str = "?help"):
+    def commands(self, game_id: str, croissantdealer: Croissantdealer, text: str = "?help", username: str = None):
         defined_commands = {
             "?help": "Available commands: "
                      "1. ?help - displays this message "
-                     "2. ?eval - displays the bot evaluation of the current position",
+                     "2. ?eval - displays the bot evaluation of the current position "
+                     "3. ?profile - toggles profiling of the bot's moves (only for the dev_username)",
             "?eval": "(+ = white, - = black, 0 = draw) This is the current evaluation of the position:"
         }
 
@@ -284,6 +322,20 @@ class Lichess:
                 move, evaluation = croissantdealer.get_move()
                 self.send_message(game_id=game_id, text=f"{defined_commands['?eval']} {evaluation}. "
                                                         f"Best move ( in my opinion :) ): {str(move)}.")
+            case "?profile":
+                if username is None or username.lower() != str(dev_username).lower():
+                    self.send_message(game_id=game_id, text="Sorry, only the dev_username can use this command :P")
+                    return
+
+                if self.profiler.is_enabled(game_id):
+                    self.profiler.disable(game_id)
+                    logs.info(f"Disabled profiling in a game with an id of: '{game_id}'")
+                    self.send_message(game_id=game_id, text="Profiling disabled.")
+                else:
+                    self.profiler.enable(game_id)
+                    logs.info(f"Enabled profiling in a game with an id of: '{game_id}'")
+                    self.send_message(game_id=game_id, text=f"Profiling enabled. The stats will be saved "
+                                                            f"in the '{self.profiler.output_dir}' directory.")
 
 
 # initialize the logs
@@ -0,0 +1,92 @@
+import cProfile
+import pstats
+import threading
+import os
+
+
+class Profiler:
+    """
+    Profiles the engine's move calculation
+
+    :param output_dir: The directory to save the .pstats files in
+    :param max_files: How many .pstats files to keep on disk (the oldest ones get removed)
+    """
+
+    # the functions that we want to see the timing of in the logs
+    watched_functions = ["get_move", "minimax", "evaluate", "get_legal_moves", "heuristic"]
+
+    def __init__(self, output_dir: str = "profiles", max_files: int = 100) -> None:
+        self.output_dir = output_dir
+        self.max_files = max_files
+        self.profiled_games = set()
+
+        # only one move can be profiled at the moment (the profiler isn't meant to run in a couple of threads at once)
+        self.lock = threading.Lock()
+
+    def enable(self, game_id: str):
+        """start profiling the moves of a game"""
+        self.profiled_games.add(game_id)
+
+    def disable(self, game_id: str):
+        """stop profiling the moves of a game"""
+        self.profiled_games.discard(game_id)
+
+    def is_enabled(self, game_id: str):
+        """returns True if the game's moves are being profiled"""
+        return game_id in self.profiled_games
+
+    def profile(self, file_name: str, function, *args, **kwargs):
+        """
+        Runs the function with the profiler enabled and saves the stats to a .pstats file
+
+        returns the function's result, the timings of the watched functions (None if we didn't profile the move)
+        and the error that happened while saving the stats (None if they got saved)
+        """
+        # if another game is being profiled right now, just calculate the move without profiling it
+        if not self.lock.acquire(blocking=False):
+            return function(*args, **kwargs), None, None
+
+        try:
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                profile.disable()
+
+            stats = pstats.Stats(profile)
+
+            # the move is already calculated, so failing to save the stats mustn't break the game
+            try:
+                os.makedirs(self.output_dir, exist_ok=True)
+                stats.dump_stats(os.path.join(self.output_dir, f"{file_name}.pstats"))
+                self.remove_old_files()
+            except OSError as e:
+                return result, None, e
+
+            return result, self.get_timings(stats), None
+        finally:
+            self.lock.release()
+
+    def get_timings(self, stats: pstats.Stats):
+        """returns the amount of calls and the cumulative time of every watched function"""
+        timings = {}
+
+        for (filename, line, name), (_, calls, _, cumulative_time, _) in stats.stats.items():
+            if name in self.watched_functions and os.path.basename(filename) == "engine.py":
+                # Engine.get_move and Croissantdealer.get_move share the name, only keep the one that does the work
+                if name in timings and timings[name]["time"] >= cumulative_time:
+                    continue
+
+                timings[name] = {"calls": calls, "time": cumulative_time}
+
+        return timings
+
+    def remove_old_files(self):
+        """removes the oldest .pstats files, so that there are at most max_files of them"""
+        files = [os.path.join(self.output_dir, file) for file in os.listdir(self.output_dir)
+                 if file.endswith(".pstats")]
+        files.sort(key=os.path.getmtime)
+
+        for file in files[:max(len(files) - self.max_files, 0)]:
+            os.remove(file)